@@ -2,6 +2,12 @@ import streamlit as st
 import yfinance as yf
 import pandas as pd
 import numpy as np
+import logging
+import os
+import zipfile
+from openpyxl.utils.exceptions import InvalidFileException
+
+logger = logging.getLogger(__name__)
 
 # ------------------------------
 # Streamlit UI - User Inputs
@@ -10,9 +16,20 @@ st.title("🚀 NIFTY Momentum Stock Picker")
 st.write("**Select your risk tolerance and time horizon for momentum stock recommendations.**")
 
 # 1. Load Excel and let user select sheet
+@st.cache_data
+def load_sheet_names(path, mtime):
+    return pd.ExcelFile(path).sheet_names
+
+@st.cache_data
+def load_tickers(path, mtime, sheet):
+    df_stocks = pd.read_excel(path, sheet_name=sheet, usecols=["Symbol"], dtype={"Symbol": "string"})
+    # Clean ticker symbols - remove .NS if already present
+    return df_stocks["Symbol"].str.removesuffix(".NS").tolist()
+
 try:
-    stock_data = pd.ExcelFile("stocklist.xlsx")  # Replace with your file path
-    sheet_names = stock_data.sheet_names  # Get all sheet names (NIFTY50, NIFTY100, etc.)
+    stock_file = "stocklist.xlsx"  # Replace with your file path
+    stock_file_mtime = os.path.getmtime(stock_file)  # Re-read the file when it changes
+    sheet_names = load_sheet_names(stock_file, stock_file_mtime)
     
     selected_sheet = st.selectbox(
         "**Select Stock Index**",
@@ -21,11 +38,9 @@ try:
     )
     
     # Read symbols from the selected sheet
-    df_stocks = pd.read_excel(stock_data, sheet_name=selected_sheet)
-    # Clean ticker symbols - remove .NS if already present
-    tickers = df_stocks["Symbol"].str.replace('.NS', '').tolist()
+    tickers = load_tickers(stock_file, stock_file_mtime, selected_sheet)
     
-except Exception as e:
+except (OSError, ValueError, zipfile.BadZipFile, InvalidFileException) as e:
     st.error(f"Error loading Excel file: {e}")
     st.stop()
 
@@ -49,71 +64,89 @@ lookback_days = time_horizon * 30  # Approximate 30 days per month
 # ------------------------------
 # Fetch & Calculate Momentum
 # ------------------------------
-def calculate_momentum(ticker, days):
+class EmptyDownload(Exception):
+    """Raised so st.cache_data does not keep a download that returned nothing."""
+
+@st.cache_data(ttl=3600, show_spinner=False)  # Reuse downloads for an hour
+def fetch_closes(ns_tickers, days):
+    data = yf.download(
+        list(ns_tickers),
+        period=f"{days}d",
+        group_by="ticker",
+        threads=16,  # Parallel download workers
+        progress=False,
+        auto_adjust=True  # Split/bonus-adjusted closes
+    )
+    if data.empty:
+        raise EmptyDownload("No price data returned")
+    # Tickers that failed stay as all-NaN columns and are reported by the caller
+    closes = data.xs("Close", axis=1, level=1).reindex(columns=list(ns_tickers))
+    if closes.isna().all(axis=None):
+        raise EmptyDownload("No price data returned")
+    return closes
+
+def calculate_momentum(tickers, days):
+    ns_tickers = tuple(f"{ticker}.NS" for ticker in tickers)
     try:
-        yf_ticker = f"{ticker}.NS"
-        data = yf.download(yf_ticker, period=f"{days}d", progress=False)["Close"]
-        if len(data) == 0:
-            return np.nan
-        return (data[-1] / data[0] - 1) * 100  # Return %
-    except:
-        return np.nan
+        closes = fetch_closes(ns_tickers, days)
+    except EmptyDownload:
+        # Not cached, so the next scan retries the download
+        return pd.DataFrame({"Ticker": tickers, "Momentum (%)": np.nan, "Current Price": np.nan})
+    
+    # One column per ticker; fill gaps so each ticker uses its own first/last close
+    prices = closes.ffill().bfill().to_numpy()
+    last_prices = prices[-1]  # Reused as current price, no extra fetch
+    momentum = (last_prices / prices[0] - 1) * 100  # Return %
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Momentum (%)": momentum,
+        "Current Price": last_prices
+    })
 
 if st.button("Get Momentum Stocks"):
     with st.spinner(f"Scanning {selected_sheet} for top momentum stocks..."):
-        momentum_data = []
-        problematic_tickers = []
-        
-        for ticker in tickers[:50]:  # Limit to 50 for demo (remove [:50] for full scan)
-            mom = calculate_momentum(ticker, lookback_days)
-            if not np.isnan(mom):
-                momentum_data.append({
-                    "Ticker": ticker,
-                    "Momentum (%)": mom,
-                    "Current Price": yf.Ticker(f"{ticker}.NS").history(period="1d")["Close"].iloc[-1]
-                })
-            else:
-                problematic_tickers.append(ticker)
+        # Limit to 50 for demo (remove [:50] for full scan)
+        results = calculate_momentum(tickers[:50], lookback_days)
+        missing = results["Momentum (%)"].isna()
+        problematic_tickers = results.loc[missing, "Ticker"].tolist()
+        momentum_data = results[~missing]
 
         if problematic_tickers:
+            logger.debug("No price data for tickers: %s", problematic_tickers)
             st.warning(f"Could not fetch data for these tickers: {', '.join(problematic_tickers)}")
 
-        if not momentum_data:
+        if momentum_data.empty:
             st.error("No stocks could be analyzed. Please try again later.")
             st.stop()
             
-        df = pd.DataFrame(momentum_data).sort_values("Momentum (%)", ascending=False)
-        
         # Adjust position sizing based on risk tolerance
         if risk_tolerance == "Low":
             allocation = 5  # Equal weight, low leverage
-            num_stocks = min(20, len(df))  # More diversified
+            num_stocks = min(20, len(momentum_data))  # More diversified
         elif risk_tolerance == "Medium":
             allocation = 8
-            num_stocks = min(12, len(df))
+            num_stocks = min(12, len(momentum_data))
         else:  # High risk
             allocation = 12  # Concentrated bets
-            num_stocks = min(8, len(df))
+            num_stocks = min(8, len(momentum_data))
         
         allocation = min(allocation, 100/num_stocks)  # Ensure total <= 100%
-        df["Allocation (%)"] = allocation
         
-        # Limit to top stocks
-        df = df.head(num_stocks)
+        # Limit to top stocks (partial selection, no full sort)
+        df = momentum_data.nlargest(num_stocks, "Momentum (%)").assign(**{"Allocation (%)": allocation})
 
     # ------------------------------
     # Display Results
     # ------------------------------
     st.success(f"✅ Top {len(df)} Momentum Stocks from {selected_sheet}")
     
-    # Format the dataframe
-    formatted_df = df.copy()
-    formatted_df["Momentum (%)"] = formatted_df["Momentum (%)"].round(2)
-    formatted_df["Current Price"] = formatted_df["Current Price"].round(2)
-    formatted_df["Allocation (%)"] = formatted_df["Allocation (%)"].round(1)
-    
+    # Format for display without copying the dataframe
     st.dataframe(
-        formatted_df.style.background_gradient(
+        df.style.format({
+            "Momentum (%)": "{:.2f}",
+            "Current Price": "{:.2f}",
+            "Allocation (%)": "{:.1f}"
+        }).background_gradient(
             subset=["Momentum (%)"],
             cmap='RdYlGn'  # Red-Yellow-Green color scale
         )